@@ -6,12 +6,17 @@ from streamlit_url_fragment import get_fragment
 import cv2
 import base64
 
+import services.helper as helper
+
 SUPABASE_URL = st.secrets["supabase"]["SUPABASE_URL"]
 SUPABASE_KEY = st.secrets["supabase"]["SUPABASE_KEY"]
 REDIRECT_URI = st.secrets["google"]["REDIRECT_URI"]
 
 st.set_page_config(layout="wide", page_title="Alcor Prime Login")
 
+if helper.WARMUP_ON_START:
+    helper.start_warmup_scheduler()
+
 def get_auth_code():
     return st.query_params.get("code")
 
@@ -3,20 +3,22 @@ import streamlit as st
 st.set_page_config(layout="wide", page_icon="logo.png")
 
 import pandas as pd
+import numpy as np
 import datetime as dt
 import altair as alt
 import calendar
 
+import services.cacheService as cacheService
 import services.helper as helper
 import services.styles as styles
-import services.supabaseService as supabaseService
 
 
 styles.style_page()
 
-all_coa = helper.get_all_coa()
-pnl_account_categories_dict = helper.get_pnl_account_categories_dict()
-account_categories = helper.transform_to_category_codes(pnl_account_categories_dict)
+coa_registry = helper.get_coa_registry()
+all_coa = coa_registry.codes
+pnl_account_categories_dict = coa_registry.pnl_account_categories_dict
+account_categories = coa_registry.account_categories
 
 
 def waterfall_chart(data, last_year_data, budget_data):
@@ -346,49 +348,41 @@ def calculate_percentage_change(actual, budget):
 
 def display_monthly(data, selected_month, selected_year):
 
-    companies = sorted(set(key.split("_")[0] for key in data.keys()))
+    companies = sorted({company for company, _, _ in data})
 
     for company in companies:
 
         st.markdown(f"<h4>{company}</h4>", unsafe_allow_html=True)
 
-        company_data = {
-            key: value for key, value in data.items() if key.startswith(company)
-        }
-
-        key = f"{company}_{selected_month}_{selected_year}"
-        last_year_key = f"{company}_{selected_month}_{selected_year-1}"
+        sheet = data.get((company, selected_year, selected_month), {})
+        last_year_sheet = data.get((company, selected_year - 1, selected_month), {})
 
-        if not data[key]["filtered_data"]:
+        if not sheet.get("filtered_data"):
             st.warning(f"Data for {company} available for {selected_month}.")
             continue
-        elif not data[last_year_key]["filtered_data"]:
+        elif not last_year_sheet.get("filtered_data"):
             st.warning(f"Last Year Data for {company} available for {selected_month}.")
             continue
-        elif not data[key]["budget"]:
+        elif not sheet.get("budget"):
             st.warning(f"Budget Data for {company} available for {selected_month}.")
             continue
 
         filtered_data = {
-            item["Category"]: item["Value"]
-            for item in company_data.get(key, {}).get("filtered_data", [])
+            item["Category"]: item["Value"] for item in sheet["filtered_data"]
         }
         operating_expenses = {
             item["Category"]: item["Value"]
-            for item in company_data.get(key, {}).get("operating_expenses", [])
+            for item in sheet.get("operating_expenses", [])
         }
         jpcc_vs_others = {
             item["Category"]: item["Value"]
-            for item in company_data.get(key, {}).get("jpcc_vs_others", [])
-        }
-        budget = {
-            item["Category"]: item["Value"]
-            for item in company_data.get(key, {}).get("budget", [])
+            for item in sheet.get("jpcc_vs_others", [])
         }
+        budget = {item["Category"]: item["Value"] for item in sheet["budget"]}
 
         filtered_data_last_year = {
             item["Category"]: item["Value"]
-            for item in company_data.get(last_year_key, {}).get("filtered_data", [])
+            for item in last_year_sheet["filtered_data"]
         }
 
         metrics = {
@@ -457,95 +451,102 @@ def display_monthly(data, selected_month, selected_year):
         st.divider()
 
 
-def display_ytd(data, selected_month, selected_year):
-    companies = sorted(set(key.split("_")[0] for key in data.keys()))
+# Per-month totals of one result section, accumulated over the year. Entry
+# m holds the YTD totals through month m, with categories in the order they
+# first appear, so any YTD month is a lookup.
+def running_totals(data, company, year, section):
+
+    month_names = list(calendar.month_abbr)[1:]
+    records = [
+        (month_index, item["Category"], item["Value"])
+        for month_index, month in enumerate(month_names)
+        for item in data.get((company, year, month), {}).get(section, [])
+    ]
+    categories = list(dict.fromkeys(category for _, category, _ in records))
+    positions = {category: i for i, category in enumerate(categories)}
+
+    months = np.array([month_index for month_index, _, _ in records], dtype=int)
+    columns = np.array([positions[category] for _, category, _ in records], dtype=int)
+    values = np.array([value for _, _, value in records], dtype=float)
+
+    totals = np.zeros((len(month_names), len(categories)))
+    np.add.at(totals, (months, columns), values)
+    totals = totals.cumsum(axis=0)
+
+    first_months = np.full(len(categories), len(month_names))
+    np.minimum.at(first_months, columns, months)
+
+    return [
+        {
+            category: float(totals[month_index, i])
+            for i, category in enumerate(categories)
+            if first_months[i] <= month_index
+        }
+        for month_index in range(len(month_names))
+    ]
 
-    month_names = list(calendar.month_abbr)
-    selected_month_index = month_names.index(selected_month)
-    valid_months = month_names[1 : selected_month_index + 1]
 
-    for company in companies:
-        st.markdown(f"<h4>{company}</h4>", unsafe_allow_html=True)
+# Built once per data version, so changing the YTD month reuses it
+@st.cache_data(max_entries=helper.PREPARE_CACHE_MAX_ENTRIES)
+def prepare_ytd_totals(_data, selected_year, version):
 
-        company_data = {
-            key: value for key, value in data.items() if key.startswith(company)
+    return {
+        company: {
+            "actual": running_totals(_data, company, selected_year, "filtered_data"),
+            "operating_expenses": running_totals(
+                _data, company, selected_year, "operating_expenses"
+            ),
+            "jpcc_vs_others": running_totals(
+                _data, company, selected_year, "jpcc_vs_others"
+            ),
+            "budget": running_totals(_data, company, selected_year, "budget"),
+            "last_year": running_totals(
+                _data, company, selected_year - 1, "filtered_data"
+            ),
         }
+        for company in sorted({company for company, _, _ in _data})
+    }
 
-        ytd_filtered = {}
-        ytd_top_5 = {}
-        ytd_filtered_last_year = {}
-        ytd_top_5_last_year = {}
-        ytd_jpcc_vs = {}
-        ytd_budget = {}
-
-        for month in valid_months:
-            selected_key = f"{company}_{month}_{selected_year}"
-            sheet = company_data.get(selected_key, {})
-
-            for item in sheet.get("filtered_data", []):
-                category = item["Category"]
-                value = item["Value"]
-                ytd_filtered[category] = ytd_filtered.get(category, 0) + value
-
-            for item in sheet.get("operating_expenses", []):
-                category = item["Category"]
-                value = item["Value"]
-                ytd_top_5[category] = ytd_top_5.get(category, 0) + value
-
-            for item in sheet.get("jpcc_vs_others", []):
-                category = item["Category"]
-                value = item["Value"]
-                ytd_jpcc_vs[category] = ytd_jpcc_vs.get(category, 0) + value
-
-            for item in sheet.get("budget", []):
-                category = item["Category"]
-                value = item["Value"]
-                ytd_budget[category] = ytd_budget.get(category, 0) + value
-
-            last_year_sheet = company_data.get(
-                f"{company}_{month}_{selected_year-1}", {}
-            )
 
-            for item in last_year_sheet.get("operating_expenses", []):
-                category = item["Category"]
-                value = item["Value"]
-                ytd_top_5_last_year[category] = (
-                    ytd_top_5_last_year.get(category, 0) + value
-                )
+def display_ytd(ytd_totals, selected_month, selected_year):
 
-            for item in last_year_sheet.get("filtered_data", []):
-                category = item["Category"]
-                value = item["Value"]
-                ytd_filtered_last_year[category] = (
-                    ytd_filtered_last_year.get(category, 0) + value
-                )
+    month_index = list(calendar.month_abbr).index(selected_month) - 1
 
-            metrics = {
-                "Revenue": (
-                    "revenue",
-                    ytd_filtered.get("REVENUE", 0),
-                    ytd_filtered_last_year.get("REVENUE", 0),
-                    ytd_budget.get("REVENUE", 0),
-                ),
-                "Total Expenses": (
-                    "expense",
-                    ytd_filtered.get("TOTAL EXPENSES", 0),
-                    ytd_filtered_last_year.get("TOTAL EXPENSES", 0),
-                    ytd_budget.get("TOTAL EXPENSES", 0),
-                ),
-                "COGS": (
-                    "cogs",
-                    ytd_filtered.get("COGS", 0),
-                    ytd_filtered_last_year.get("COGS", 0),
-                    ytd_budget.get("COGS", 0),
-                ),
-                "Net Profit": (
-                    "net",
-                    ytd_filtered.get("NET PROFIT", 0),
-                    ytd_filtered_last_year.get("NET PROFIT", 0),
-                    ytd_budget.get("NET PROFIT", 0),
-                ),
-            }
+    for company, totals in ytd_totals.items():
+        st.markdown(f"<h4>{company}</h4>", unsafe_allow_html=True)
+
+        ytd_filtered = totals["actual"][month_index]
+        ytd_top_5 = totals["operating_expenses"][month_index]
+        ytd_filtered_last_year = totals["last_year"][month_index]
+        ytd_jpcc_vs = totals["jpcc_vs_others"][month_index]
+        ytd_budget = totals["budget"][month_index]
+
+        metrics = {
+            "Revenue": (
+                "revenue",
+                ytd_filtered.get("REVENUE", 0),
+                ytd_filtered_last_year.get("REVENUE", 0),
+                ytd_budget.get("REVENUE", 0),
+            ),
+            "Total Expenses": (
+                "expense",
+                ytd_filtered.get("TOTAL EXPENSES", 0),
+                ytd_filtered_last_year.get("TOTAL EXPENSES", 0),
+                ytd_budget.get("TOTAL EXPENSES", 0),
+            ),
+            "COGS": (
+                "cogs",
+                ytd_filtered.get("COGS", 0),
+                ytd_filtered_last_year.get("COGS", 0),
+                ytd_budget.get("COGS", 0),
+            ),
+            "Net Profit": (
+                "net",
+                ytd_filtered.get("NET PROFIT", 0),
+                ytd_filtered_last_year.get("NET PROFIT", 0),
+                ytd_budget.get("NET PROFIT", 0),
+            ),
+        }
 
         col1, col2, col3, col4 = st.columns([2, 2, 3, 3])
 
@@ -586,19 +587,15 @@ def display_ytd(data, selected_month, selected_year):
 
 def display_cash_flow_table(data, selected_year):
 
-    companies = sorted({key.split("_")[0] for key in data.keys()})
+    companies = sorted({company for company, _, _ in data})
     all_months = sorted(
-        {key.split("_")[1] for key in data.keys()},
+        {month for _, _, month in data},
         key=lambda x: list(calendar.month_abbr).index(x),
     )
     company_html_dict = {}
 
     cash_flow = {comp: {} for comp in companies}
-    for key, value in data.items():
-        parts = key.split("_")
-        if len(parts) < 3:
-            continue
-        company, month, year = parts[0], parts[1], parts[2]
+    for (company, year, month), value in data.items():
         for item in value.get("filtered_data", []):
             category = item["Category"]
             amount = float(item["Value"] or 0)
@@ -608,9 +605,9 @@ def display_cash_flow_table(data, selected_year):
                     "Budget": {m: 0 for m in all_months},
                     "Last": {m: 0 for m in all_months},
                 }
-            if year == str(selected_year):
+            if year == selected_year:
                 cash_flow[company][category]["Actual"][month] = amount
-            elif year == str(selected_year - 1):
+            elif year == selected_year - 1:
                 cash_flow[company][category]["Last"][month] = amount
         for item in value.get("budget", []):
             category = item["Category"]
@@ -621,7 +618,7 @@ def display_cash_flow_table(data, selected_year):
                     "Budget": {m: 0 for m in all_months},
                     "Last": {m: 0 for m in all_months},
                 }
-            if year == str(selected_year):
+            if year == selected_year:
                 cash_flow[company][category]["Budget"][month] = amount
     for company in cash_flow:
         for category in cash_flow[company]:
@@ -706,19 +703,19 @@ def display_cash_flow_table(data, selected_year):
             row_id += 1
 
         if "NET PROFIT MARGIN (%)" in cash_flow[company]:
-            np = cash_flow[company]["NET PROFIT MARGIN (%)"]
+            margins = cash_flow[company]["NET PROFIT MARGIN (%)"]
             actual_values = "".join(
-                f"<td>{np['Actual'].get(m, 0):,.0f}%</td>" for m in all_months
+                f"<td>{margins['Actual'].get(m, 0):,.0f}%</td>" for m in all_months
             )
             budget_values = "".join(
-                f"<td>{np['Budget'].get(m, 0):,.0f}%</td>" for m in all_months
+                f"<td>{margins['Budget'].get(m, 0):,.0f}%</td>" for m in all_months
             )
             last_values = "".join(
-                f"<td>{np['Last'].get(m, 0):,.0f}%</td>" for m in all_months
+                f"<td>{margins['Last'].get(m, 0):,.0f}%</td>" for m in all_months
             )
-            actual_ytd = f"<td>{np['Actual']['YTD']:,.0f}%</td>"
-            budget_ytd = f"<td>{np['Budget']['YTD']:,.0f}%</td>"
-            last_ytd = f"<td>{np['Last']['YTD']:,.0f}%</td>"
+            actual_ytd = f"<td>{margins['Actual']['YTD']:,.0f}%</td>"
+            budget_ytd = f"<td>{margins['Budget']['YTD']:,.0f}%</td>"
+            last_ytd = f"<td>{margins['Last']['YTD']:,.0f}%</td>"
 
             rows += f"""
                 <tr>
@@ -774,233 +771,171 @@ def display_cash_flow_table(data, selected_year):
         )
 
 
-def to_camel_case(month):
-    return "".join(word.capitalize() for word in month.lower().split())
+def summarize_actuals(lines):
 
+    categories = list(lines["category"].cat.categories)
+    categorized_data = {category: 0 for category in categories}
 
-@st.cache_data
-def prepare_data(data_store, companies, selected_year):
+    # bincount adds each category's lines in report order
+    positions = lines["category"].cat.codes.to_numpy()
+    totals = np.bincount(
+        positions, weights=lines["value"].to_numpy(), minlength=len(categories)
+    )
+    counts = np.bincount(positions, minlength=len(categories))
 
-    results = {}
+    for position in np.flatnonzero(counts):
+        categorized_data[categories[position]] = float(totals[position])
 
-    predefined_budget = {
-        "NET REVENUE": "REVENUE",
-        "TOTAL COGS": "COGS",
-        "GROSS PROFIT": "GROSS PROFIT",
-        "TOTAL HUMAN RESOURCES": "HUMAN RESOURCES",
-        "TOTAL OPERATING & GA EXPENSES": "OPERATIONAL EXPENSES",
-        "TOTAL DEPRECIATION & REPAIR MAINTENANCE": "DEPRECIATION & MAINTENANCE",
-        "GRAND TOTAL EXPENSES": "TOTAL EXPENSES",
-        "TOTAL OTHER INCOME / EXPENSES": "OTHER INCOME / EXPENSES",
-        "EARNINGS AFTER TAX (EAT)": "NET PROFIT",
+    if categorized_data["REVENUE"] and categorized_data["COGS"]:
+        categorized_data["GROSS PROFIT"] = (
+            categorized_data["REVENUE"] - categorized_data["COGS"]
+        )
+
+    categorized_data["TOTAL EXPENSES"] = (
+        categorized_data["OPERATIONAL EXPENSES"]
+        + categorized_data["HUMAN RESOURCES"]
+        + categorized_data["DEPRECIATION & MAINTENANCE"]
+    )
+
+    if categorized_data["GROSS PROFIT"] is not None:
+        categorized_data["NET PROFIT"] = (
+            categorized_data["GROSS PROFIT"]
+            - categorized_data["TOTAL EXPENSES"]
+            + categorized_data["OTHER INCOME / EXPENSES"]
+        )
+
+    filtered_df = pd.DataFrame(
+        [
+            {"Category": category, "Value": value}
+            for category, value in categorized_data.items()
+            if value is not None
+        ]
+    )
+
+    # Top expenses
+    operating_expense_df = lines.loc[
+        lines["category"] == "OPERATIONAL EXPENSES", ["description", "value"]
+    ]
+    operating_expense_df.columns = ["Category", "Value"]
+
+    if filtered_df["Value"].max() > 1_000:
+        filtered_df["Value"] /= 1_000
+    if not operating_expense_df.empty and operating_expense_df["Value"].max() > 1_000:
+        operating_expense_df["Value"] /= 1_000
+
+    return {
+        "filtered_data": filtered_df.to_dict(orient="records"),
+        "operating_expenses": operating_expense_df.to_dict(orient="records"),
+        "jpcc_vs_others": [],
     }
 
-    month_abbr = set(calendar.month_abbr[1:])
-    jpcc_vs_others = pd.DataFrame(supabaseService.fetch_data("JPCC vs Others"))
 
-    for company in companies:
+def summarize_budget(rows):
 
-        years_to_check = [selected_year, selected_year - 1]
+    budget_df = rows[["category", "value"]].astype({"category": "object"})
+    budget_df.columns = ["Category", "Value"]
 
-        for year in years_to_check:
+    if budget_df["Value"].max() > 1_000:
+        budget_df["Value"] /= 1_000
 
-            if year not in data_store[company]:
-                continue
+    return budget_df.to_dict(orient="records")
+
+
+# Shapes one company/year folder into per-month results keyed by
+# (company, year, month), cached per partition content and COA version
+@st.cache_data(max_entries=helper.PREPARE_CACHE_MAX_ENTRIES)
+def prepare_partition(_data_store, company, year, version):
+    return helper.shared_partition_result(
+        "dashboard",
+        _data_store,
+        company,
+        year,
+        lambda: shape_partition(
+            helper.load_partition_facts(_data_store, company, year, version)
+        ),
+    )
+
+
+def shape_partition(facts):
+
+    results = {}
+    periods = ["company", "year", "month"]
+
+    actuals = facts[facts["type"] == "Actual"]
+    for (company, year, month), lines in actuals.groupby(
+        periods, observed=True, sort=False
+    ):
+        results[(company, int(year), month)] = summarize_actuals(lines)
 
-            for file_name, df in data_store[company][year].items():
-
-                if df is None or df.empty:
-                    st.warning(
-                        f"File '{file_name}' for '{company}' in year '{year}' is empty or missing."
-                    )
-                    continue
-
-                if "Management Report" in file_name:
-                    month_str = next(
-                        (month for month in month_abbr if month in file_name), None
-                    )
-                    if not month_str:
-                        continue
-
-                    key = f"{company}_{month_str}_{year}"
-
-                    if pd.to_numeric(df.iloc[0], errors="coerce").notna().all():
-                        df.iloc[0] = df.iloc[1]
-
-                    df.iloc[:, 0] = df.iloc[:, 0].astype(str).str.strip()
-                    df.iloc[:, 2] = pd.to_numeric(df.iloc[:, 2], errors="coerce")
-
-                    valid_codes = set(
-                        str(code)
-                        for codes in account_categories.values()
-                        if codes
-                        for code in codes
-                    )
-                    df = df[df.iloc[:, 0].isin(valid_codes)]
-
-                    categorized_data = {category: 0 for category in account_categories}
-
-                    for _, row in df.iterrows():
-                        try:
-                            account_code = int(row.iloc[0])
-                            value = float(row.iloc[2])
-                        except ValueError:
-                            continue
-
-                        for category, codes in account_categories.items():
-                            if codes and account_code in codes:
-                                categorized_data[category] += value
-
-                    if categorized_data["REVENUE"] and categorized_data["COGS"]:
-                        categorized_data["GROSS PROFIT"] = (
-                            categorized_data["REVENUE"] - categorized_data["COGS"]
-                        )
-
-                    categorized_data["TOTAL EXPENSES"] = (
-                        categorized_data["OPERATIONAL EXPENSES"]
-                        + categorized_data["HUMAN RESOURCES"]
-                        + categorized_data["DEPRECIATION & MAINTENANCE"]
-                    )
-
-                    if categorized_data["GROSS PROFIT"] is not None:
-                        categorized_data["NET PROFIT"] = (
-                            categorized_data["GROSS PROFIT"]
-                            - categorized_data["TOTAL EXPENSES"]
-                            + categorized_data["OTHER INCOME / EXPENSES"]
-                        )
-
-                    filtered_df = pd.DataFrame(
-                        [
-                            {"Category": category, "Value": value}
-                            for category, value in categorized_data.items()
-                            if value is not None
-                        ]
-                    )
-
-                    # Top expenses
-                    category_col = df.columns[0]
-                    df[category_col] = df[category_col].astype(int)
-                    operating_expense_df = df[
-                        df[category_col].isin(
-                            account_categories["OPERATIONAL EXPENSES"]
-                        )
-                    ].drop(columns=df.columns[0])
-                    operating_expense_df.columns = ["Category", "Value"]
-
-                    if filtered_df["Value"].max() > 1_000:
-                        filtered_df["Value"] /= 1_000
-                    if (
-                        not operating_expense_df.empty
-                        and operating_expense_df["Value"].max() > 1_000
-                    ):
-                        operating_expense_df["Value"] /= 1_000
-
-                    if key not in results:
-                        results[key] = {
-                            "filtered_data": [],
-                            "operating_expenses": [],
-                            "jpcc_vs_others": [],
-                        }
-
-                    results[key].update(
-                        {
-                            "filtered_data": filtered_df.to_dict(orient="records"),
-                            "operating_expenses": operating_expense_df.to_dict(
-                                orient="records"
-                            ),
-                        }
-                    )
-
-                elif "Budget" in file_name:
-                    header_row_index = 6
-                    df.columns = df.iloc[header_row_index]
-                    duplicates = df.columns.duplicated(keep=False)
-                    df.columns = [
-                        f"{col}_{i}" if duplicates[i] else col
-                        for i, col in enumerate(df.columns)
-                    ]
-                    df = df.iloc[header_row_index + 1 :].reset_index(drop=True)
-                    month_cols = [
-                        col
-                        for col in df.columns.astype(str)
-                        if "nan" not in col.lower()
-                    ]
-
-                    df = df[["nan_2", "nan_3"] + month_cols]
-                    df["nan_2"] = df["nan_2"].fillna(df["nan_3"])
-                    df.drop(columns=["nan_3"], inplace=True)
-
-                    def clean_string(s):
-                        return str(s).strip().upper()
-
-                    predefined_budget_cleaned = {
-                        clean_string(k): v for k, v in predefined_budget.items()
-                    }
-                    df["nan_2"] = df["nan_2"].apply(clean_string)
-                    df = df[df["nan_2"].isin(predefined_budget_cleaned.keys())]
-                    df["nan_2"] = df["nan_2"].map(predefined_budget_cleaned)
-
-                    for month in df.columns[1:]:
-                        key = f"{company}_{to_camel_case(month.split()[0])}_{year}"
-
-                        if key not in results:
-                            results[key] = {
-                                "filtered_data": [],
-                                "operating_expenses": [],
-                                "budget": [],
-                                "jpcc_vs_others": [],
-                            }
-
-                        elif "budget" not in results[key]:
-                            results[key]["budget"] = []
-
-                        budget_data = [
-                            {"Category": row["nan_2"], "Value": row[month]}
-                            for _, row in df.iterrows()
-                        ]
-
-                        values = [item["Value"] for item in budget_data]
-                        if max(values) > 1_000:
-                            for item in budget_data:
-                                item["Value"] /= 1_000
-
-                        results[key]["budget"].extend(budget_data)
-
-        df = jpcc_vs_others[
-            (jpcc_vs_others["company"] == company)
-            & (jpcc_vs_others["year"].isin([selected_year, selected_year - 1]))
+    # Budget summary rows carry the category totals; COA lines are for the PNL
+    budget = facts[(facts["type"] == "Budget") & facts["COA"].isna()]
+    for (company, year, month), rows in budget.groupby(
+        periods, observed=True, sort=False
+    ):
+        key = (company, int(year), month)
+        results.setdefault(
+            key, {"filtered_data": [], "operating_expenses": [], "jpcc_vs_others": []}
+        )
+        results[key]["budget"] = summarize_budget(rows)
+
+    return results
+
+
+@st.cache_data(max_entries=helper.PREPARE_CACHE_MAX_ENTRIES)
+def prepare_jpcc_vs_others(company, selected_year, generation):
+
+    results = {}
+    years = [selected_year, selected_year - 1]
+    facts = helper.load_jpcc_facts(generation)
+    rows = facts[(facts["company"] == company) & facts["year"].isin(years)]
+
+    for month, month_rows in rows.groupby("month", observed=True, sort=False):
+        results[month] = [
+            {"Category": f"{fact_type}_{year}", "Value": value}
+            for year in years
+            for fact_type, value in month_rows.loc[
+                month_rows["year"] == year, ["type", "value"]
+            ].itertuples(index=False)
         ]
 
-        for month in df["month"].unique():
-            month_data = df[df["month"] == month]
+    return results
 
-            current_year_data = month_data[month_data["year"] == selected_year]
-            last_year_data = month_data[month_data["year"] == selected_year - 1]
 
-            key = f"{company}_{month}_{selected_year}"
+# Identifies everything prepare_data reads, so reruns that only change a
+# month or a tab reuse the combined results and the YTD totals built on them
+def data_version(data_store, companies, selected_year):
+    return (
+        tuple(companies),
+        tuple(
+            (company, year, data_store.partition_version(company, year))
+            for company in companies
+            for year in (selected_year, selected_year - 1)
+            if year in data_store.get(company, {})
+        ),
+        cacheService.table_token("JPCC vs Others"),
+    )
 
-            if key not in results:
-                results[key] = {"jpcc_vs_others": []}
 
-            result = []
+# Combines the cached partitions of the selected companies and years
+@st.cache_data(max_entries=helper.PREPARE_CACHE_MAX_ENTRIES)
+def prepare_data(_data_store, companies, selected_year, version):
 
-            for _, row in current_year_data.iterrows():
-                result.append(
-                    {"Category": f"JPCC_{selected_year}", "Value": row["jpcc"]}
-                )
-                result.append(
-                    {"Category": f"Others_{selected_year}", "Value": row["others"]}
-                )
+    results = {}
+    _, partitions, jpcc_generation = version
 
-            for _, row in last_year_data.iterrows():
-                result.append(
-                    {"Category": f"JPCC_{selected_year-1}", "Value": row["jpcc"]}
-                )
-                result.append(
-                    {"Category": f"Others_{selected_year-1}", "Value": row["others"]}
-                )
+    for company, year, partition_version in partitions:
+        results.update(
+            prepare_partition(_data_store, company, year, partition_version)
+        )
 
-            results[key]["jpcc_vs_others"] = result
+    for company in companies:
+        jpcc_vs_others = prepare_jpcc_vs_others(
+            company, selected_year, jpcc_generation
+        )
+        for month, rows in jpcc_vs_others.items():
+            key = (company, selected_year, month)
+            results.setdefault(key, {"jpcc_vs_others": []})
+            results[key]["jpcc_vs_others"] = rows
 
     return results
 
@@ -1012,6 +947,7 @@ def main():
         return
 
     data_store = helper.fetch_dropbox_data()
+    helper.show_data_as_of(data_store)
     available_companies, available_years = helper.get_available_companies_and_years(
         data_store
     )
@@ -1037,11 +973,14 @@ def main():
     with col4:
         st.markdown("<div style='width: 1px; height: 28px'></div>", unsafe_allow_html=True)
         if st.button("**Refresh**"):
-            st.cache_data.clear()
+            cacheService.invalidate_selection(
+                companies, [selected_year, selected_year - 1]
+            )
             st.rerun()
 
 
-    data = prepare_data(data_store, companies, selected_year)
+    version = data_version(data_store, companies, selected_year)
+    data = prepare_data(data_store, companies, selected_year, version)
     available_months = helper.get_available_months(data, companies, selected_year)
     tab1, tab2, tab3 = st.tabs(["Monthly Dashboard", "YTD Dashboard", "Data"])
 
@@ -1075,7 +1014,8 @@ def main():
                     key="ytd",
                 )
             st.divider()
-            display_ytd(data, selected_month, selected_year)
+            ytd_totals = prepare_ytd_totals(data, selected_year, version)
+            display_ytd(ytd_totals, selected_month, selected_year)
 
     with tab3:
         display_cash_flow_table(data, selected_year)
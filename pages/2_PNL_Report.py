@@ -5,6 +5,7 @@ import calendar
 import re
 import math
 
+import services.cacheService as cacheService
 import services.helper as helper
 import services.styles as styles
 
@@ -13,155 +14,107 @@ st.logo("logo.png")
 
 styles.style_page()
 
-pnl_account_categories_dict = helper.get_pnl_account_categories_dict()
-account_categories = helper.transform_to_category_codes(pnl_account_categories_dict)
-
-
-def to_camel_case(month):
-    return "".join(word.capitalize() for word in month.lower().split())
+coa_registry = helper.get_coa_registry()
+pnl_account_categories_dict = coa_registry.pnl_account_categories_dict
+account_categories = coa_registry.account_categories
+
+
+# Shapes one company/year folder into per-month COA lines keyed by
+# (company, year, month), cached per partition content and COA version
+@st.cache_data(max_entries=helper.PREPARE_CACHE_MAX_ENTRIES)
+def prepare_pnl_partition(_data_store, company, year, version):
+    return helper.shared_partition_result(
+        "pnl",
+        _data_store,
+        company,
+        year,
+        lambda: shape_pnl_partition(
+            helper.load_partition_facts(_data_store, company, year, version)
+        ),
+    )
 
 
-@st.cache_data
-def prepare_pnl_data(data_store, companies, selected_year):
+def shape_pnl_partition(facts):
 
     results = {}
-    month_abbr = set(calendar.month_abbr[1:])
+    facts = facts[facts["type"].isin(["Actual", "Budget"])]
 
-    for company in companies:
-        if selected_year not in data_store.get(company, {}):
-            continue
+    for (company, year, month, fact_type), rows in facts.groupby(
+        ["company", "year", "month", "type"], observed=True, sort=False
+    ):
+        key = (company, int(year), month)
+        if key not in results:
+            results[key] = {"filtered_data": [], "budget": []}
 
-        years_to_check = [selected_year, selected_year - 1]
+        lines = rows.loc[rows["COA"].notna(), ["COA", "value"]]
+        lines.columns = ["COA", "Value"]
+        section = "filtered_data" if fact_type == "Actual" else "budget"
+        results[key][section] = lines.to_dict("records")
 
-        for year in years_to_check:
-
-            if year not in data_store.get(company, {}):
-                continue
+    return results
 
-            for file_name, df in data_store[company][year].items():
 
-                if df is None or df.empty:
-                    st.warning(
-                        f"File '{file_name}' for '{company}' in year '{year}' is empty or missing."
-                    )
-                    continue
+# Combines the cached partitions of the companies that have the selected year
+def prepare_pnl_data(data_store, companies, selected_year):
 
-                if "Management Report" in file_name:
-                    month_str = next(
-                        (month for month in month_abbr if month in file_name), None
-                    )
-                    if not month_str:
-                        continue
+    results = {}
 
-                    key = f"{company}_{month_str}_{year}"
+    for company in companies:
+        if selected_year not in data_store.get(company, {}):
+            continue
 
-                    df.iloc[:, 2] = pd.to_numeric(df.iloc[:, 2], errors="coerce")
-                    df.columns = ["COA", "Description", "Value"]
-                    df["COA"] = pd.to_numeric(
-                        df["COA"], errors="coerce", downcast="integer"
+        for year in (selected_year, selected_year - 1):
+            if year in data_store[company]:
+                results.update(
+                    prepare_pnl_partition(
+                        data_store,
+                        company,
+                        year,
+                        data_store.partition_version(company, year),
                     )
-
-                    financial_data = []
-
-                    for codes in account_categories.values():
-                        if codes is not None:
-                            category_data = df[df["COA"].isin(codes)]
-                            if not category_data.empty:
-                                for _, row in category_data.iterrows():
-                                    financial_data.append(
-                                        {"COA": row["COA"], "Value": row["Value"]}
-                                    )
-
-                    if key not in results:
-                        results[key] = {"filtered_data": [], "budget": []}
-                    results[key]["filtered_data"] = financial_data
-
-                elif "Budget" in file_name:
-                    header_row_index = 6
-                    df.columns = df.iloc[header_row_index]
-                    duplicates = df.columns.duplicated(keep=False)
-                    df.columns = [
-                        f"{col}_{i}" if duplicates[i] else col
-                        for i, col in enumerate(df.columns)
-                    ]
-                    df = df.iloc[header_row_index + 1 :].reset_index(drop=True)
-                    month_cols = [
-                        col
-                        for col in df.columns.astype(str)
-                        if "nan" not in col.lower()
-                    ]
-                    df = df[["nan_0"] + month_cols]
-                    df = df.dropna(subset=["nan_0"])
-
-                    for month in df.columns[1:]:
-                        month_str = str(month).strip()
-
-                        if not month_str or month_str.lower() == "nan":
-                            continue
-
-                        key = f"{company}_{to_camel_case(month_str.split()[0])}_{year}"
-                        budget_data = []
-
-                        for codes in account_categories.values():
-                            if codes is not None:
-                                category_data = df[df["nan_0"].isin(codes)]
-                                if not category_data.empty:
-                                    for _, row in category_data.iterrows():
-                                        budget_data.append(
-                                            {"COA": row["nan_0"], "Value": row[month]}
-                                        )
-
-                        if key not in results:
-                            results[key] = {"filtered_data": [], "budget": []}
-                        results[key]["budget"] = budget_data
+                )
 
     return results
 
 
 def transform_data(data, selected_year, selected_month):
 
-    companies = sorted(set(key.split("_")[0] for key in data.keys()))
+    companies = sorted({company for company, _, _ in data})
     month_order = list(calendar.month_abbr)[1:]
+    months = month_order[: month_order.index(selected_month) + 1]
     company_html_dict = {}
 
     for company in companies:
 
-        company_data = {
-            key: value for key, value in data.items() if key.startswith(company)
-        }
-
-        key = f"{company}_{selected_month}_{selected_year}"
         table_data = []
-        for company_month, data_dict in company_data.items():
-
-            company, month, year = company_month.split("_")
-            if month_order.index(month) > month_order.index(selected_month):
-                continue
-
-            year = int(year)
-
-            for record in data_dict.get("filtered_data", []):
-                table_data.append(
-                    {
-                        "Company": company,
-                        "Month": month,
-                        "Year": year,
-                        "COA": record["COA"],
-                        "Value": record["Value"],
-                        "Type": "Actual",
-                    }
-                )
-            for record in data_dict.get("budget", []):
-                table_data.append(
-                    {
-                        "Company": company,
-                        "Month": month,
-                        "Year": year,
-                        "COA": record["COA"],
-                        "Value": record["Value"],
-                        "Type": "Budget",
-                    }
-                )
+        for year in (selected_year, selected_year - 1):
+            for month in months:
+                data_dict = data.get((company, year, month))
+                if data_dict is None:
+                    continue
+
+                for record in data_dict.get("filtered_data", []):
+                    table_data.append(
+                        {
+                            "Company": company,
+                            "Month": month,
+                            "Year": year,
+                            "COA": record["COA"],
+                            "Value": record["Value"],
+                            "Type": "Actual",
+                        }
+                    )
+                for record in data_dict.get("budget", []):
+                    table_data.append(
+                        {
+                            "Company": company,
+                            "Month": month,
+                            "Year": year,
+                            "COA": record["COA"],
+                            "Value": record["Value"],
+                            "Type": "Budget",
+                        }
+                    )
 
         df = pd.DataFrame(table_data)
 
@@ -695,6 +648,7 @@ def main():
         return
 
     data_store = helper.fetch_dropbox_data()
+    helper.show_data_as_of(data_store)
     available_companies, available_years = helper.get_available_companies_and_years(
         data_store
     )
@@ -751,7 +705,9 @@ def main():
             "<div style='width: 1px; height: 28px'></div>", unsafe_allow_html=True
         )
         if st.button("**Refresh**"):
-            st.cache_data.clear()
+            cacheService.invalidate_selection(
+                companies, [selected_year, selected_year - 1]
+            )
             st.rerun()
 
 
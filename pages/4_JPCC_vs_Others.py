@@ -19,12 +19,12 @@ def main():
         return
 
     df = pd.DataFrame(supabaseService.fetch_data("JPCC vs Others"))
-    data_store = helper.fetch_dropbox_data()
+    directory = helper.fetch_company_directory()
     save_success = False
 
     st.markdown("<h3>JPCC vs Others</h3>", unsafe_allow_html=True)
 
-    companies = data_store.keys()
+    companies = list(directory)
 
     selected_companies = st.multiselect("Select PT (Default = All)", companies)
 
@@ -18,8 +18,7 @@ def main():
         return
 
     df = pd.DataFrame(supabaseService.fetch_data("Users"))
-    data_store = helper.fetch_dropbox_data()
-    companies, _ = helper.get_available_companies_and_years(data_store)
+    companies = sorted(helper.fetch_company_directory())
 
     st.markdown("<h3>Users</h3>", unsafe_allow_html=True)
 
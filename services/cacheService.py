@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import CancelledError, Future
+
+# Cached functions take generation tokens as arguments. Invalidating bumps
+# the matching counters, so only entries keyed on them are rebuilt and
+# other sessions' caches stay warm.
+generations = {}
+generations_lock = threading.Lock()
+
+ALL = ("all",)
+LISTING = ("listing",)
+
+
+def bump(*scopes):
+    with generations_lock:
+        for scope in scopes:
+            generations[scope] = generations.get(scope, 0) + 1
+
+
+def generation(*scopes):
+    with generations_lock:
+        return tuple(generations.get(scope, 0) for scope in scopes)
+
+
+def listing_token():
+    return generation(ALL, LISTING)
+
+
+def partition_token(company, year):
+    return generation(ALL, ("company", company), ("partition", company, year))
+
+
+def table_token(table_name):
+    return generation(ALL, ("table", table_name))
+
+
+def invalidate_all():
+    bump(ALL)
+
+
+def invalidate_listing():
+    bump(LISTING)
+
+
+# Company and company/year scopes rebuild the cached partitions even when
+# their file hashes did not change. They do not re-list storage on their own.
+def invalidate_company(company):
+    bump(("company", company))
+
+
+def invalidate_partition(company, year):
+    bump(("partition", company, year))
+
+
+def invalidate_table(table_name):
+    bump(("table", table_name))
+
+
+# Re-reads the storage listing and the Supabase tables the reports use.
+# Partitions and prepared results are keyed on file content hashes, so only
+# those whose files changed are rebuilt.
+def invalidate_sources():
+    invalidate_listing()
+    invalidate_table("COA")
+    invalidate_table("JPCC vs Others")
+
+
+# What the Refresh buttons call: the sources, plus the partitions on screen
+def invalidate_selection(companies, years):
+    invalidate_sources()
+    for company in companies:
+        for year in years:
+            invalidate_partition(company, year)
+
+
+# Collapses concurrent loads of the same key: the first caller runs the
+# loader and everyone else arriving meanwhile waits for its result.
+class SingleFlight:
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def run(self, key, load):
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self.calls[key] = Future()
+
+            if leader:
+                return self.lead(key, call, load)
+
+            try:
+                return call.result()
+            except CancelledError:
+                continue
+
+    def lead(self, key, call, load):
+        try:
+            result = load()
+        except Exception as e:
+            self.release(key)
+            call.set_exception(e)
+            raise
+        except BaseException:
+            # Streamlit's rerun and stop signals belong to the leader's
+            # session; the waiters retry and one of them loads instead
+            self.release(key)
+            call.cancel()
+            raise
+
+        self.release(key)
+        call.set_result(result)
+        return result
+
+    def release(self, key):
+        with self.lock:
+            del self.calls[key]
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,217 @@
+import datetime as dt
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+NULL, INT, FLOAT, TEXT, BOOL, DATETIME, TIME = range(7)
+
+
+class DiskCache:
+    suffix = ""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_path(self, content_hash, name):
+        name_key = hashlib.sha1(str(name).lower().encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{content_hash}-{name_key}{self.suffix}")
+
+    def contains(self, content_hash, name):
+        return os.path.exists(self.entry_path(content_hash, name))
+
+    def open_entry(self, entry_path):
+        if not os.path.exists(entry_path):
+            return False
+
+        # mtime doubles as the last-access time for LRU eviction
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def write_entry(self, entry_path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, entry_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            total = 0
+
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            for _, size, entry_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(entry_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+class WorkbookCache(DiskCache):
+    suffix = ".xlsx"
+
+    def contains(self, path, content_hash):
+        return super().contains(content_hash, path)
+
+    def get(self, path, content_hash):
+        entry_path = self.entry_path(content_hash, path)
+        if not self.open_entry(entry_path):
+            return None
+
+        try:
+            with open(entry_path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, path, content_hash, content):
+        self.write_entry(
+            self.entry_path(content_hash, path), lambda f: f.write(content)
+        )
+
+
+def encode_value(value):
+    if value is None or value is pd.NaT:
+        return NULL, None, None
+    if isinstance(value, float) and np.isnan(value):
+        return NULL, None, None
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL, float(value), None
+    if isinstance(value, (int, np.integer)):
+        return INT, None, str(value)
+    if isinstance(value, (float, np.floating)):
+        return FLOAT, float(value), None
+    if isinstance(value, (dt.datetime, dt.date)):
+        return DATETIME, None, pd.Timestamp(value).isoformat()
+    if isinstance(value, dt.time):
+        return TIME, None, value.isoformat()
+
+    return TEXT, None, str(value)
+
+
+def decode_value(kind, number, text):
+    if kind == BOOL:
+        return bool(number)
+    if kind == INT:
+        return int(text)
+    if kind == FLOAT:
+        return number
+    if kind == DATETIME:
+        return pd.Timestamp(text).to_pydatetime()
+    if kind == TIME:
+        return dt.time.fromisoformat(text)
+    if kind == TEXT:
+        return text
+
+    return np.nan
+
+
+# Excel sheets come back as object columns mixing text, numbers and dates,
+# which Arrow cannot store as-is. Each such column is split into a kind tag
+# plus a numeric and a text column so the exact Python values round-trip.
+def frame_to_table(df):
+    columns = {}
+    layout = []
+
+    for i, (name, series) in enumerate(df.items()):
+        encoded_name = encode_value(name)
+
+        if series.dtype != object:
+            columns[f"{i}"] = series.to_numpy()
+            layout.append({"name": encoded_name, "encoded": False})
+            continue
+
+        encoded = [encode_value(value) for value in series.tolist()]
+        kinds = [kind for kind, _, _ in encoded]
+        numbers = [number for _, number, _ in encoded]
+        texts = [text for _, _, text in encoded]
+        columns[f"{i}.kind"] = pa.array(kinds, type=pa.int8())
+        columns[f"{i}.number"] = pa.array(numbers, type=pa.float64())
+        columns[f"{i}.text"] = pa.array(texts, type=pa.string())
+        layout.append({"name": encoded_name, "encoded": True})
+
+    metadata = {"layout": json.dumps(layout), "rows": str(len(df))}
+    return pa.table(columns).replace_schema_metadata(metadata)
+
+
+def table_to_frame(table):
+    metadata = table.schema.metadata
+    layout = json.loads(metadata[b"layout"])
+    rows = int(metadata[b"rows"])
+    data = {}
+
+    for i, column in enumerate(layout):
+        if not column["encoded"]:
+            data[i] = table.column(f"{i}").to_pandas()
+            continue
+
+        kinds = table.column(f"{i}.kind").to_numpy()
+        numbers = table.column(f"{i}.number").to_numpy(zero_copy_only=False)
+        texts = table.column(f"{i}.text").to_pylist()
+        values = np.full(rows, np.nan, dtype=object)
+
+        numeric = kinds == FLOAT
+        values[numeric] = numbers[numeric].tolist()
+
+        for j in np.flatnonzero((kinds != NULL) & ~numeric):
+            values[j] = decode_value(kinds[j], numbers[j], texts[j])
+
+        data[i] = pd.Series(values, dtype=object)
+
+    df = pd.DataFrame(data, index=pd.RangeIndex(rows))
+    df.columns = [decode_value(*column["name"]) for column in layout]
+    return df
+
+
+class SheetCache(DiskCache):
+    suffix = ".parquet"
+
+    def get(self, content_hash, sheet_name):
+        entry_path = self.entry_path(content_hash, sheet_name)
+        if not self.open_entry(entry_path):
+            return None
+
+        try:
+            return table_to_frame(pq.read_table(entry_path))
+        except (FileNotFoundError, pa.ArrowException):
+            return None
+
+    def put(self, content_hash, sheet_name, df):
+        table = frame_to_table(df)
+        self.write_entry(
+            self.entry_path(content_hash, sheet_name),
+            lambda f: pq.write_table(table, f),
+        )
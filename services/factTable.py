@@ -0,0 +1,166 @@
+import calendar
+
+import pandas as pd
+import streamlit as st
+
+MONTHS = list(calendar.month_abbr)[1:]
+TYPES = ["Actual", "Budget", "JPCC", "Others"]
+COLUMNS = [
+    "company",
+    "year",
+    "month",
+    "type",
+    "COA",
+    "category",
+    "description",
+    "value",
+]
+
+BUDGET_HEADER_ROW = 6
+
+# Budget sheet summary rows and the report category each one is shown as
+BUDGET_SUMMARY_ROWS = {
+    "NET REVENUE": "REVENUE",
+    "TOTAL COGS": "COGS",
+    "GROSS PROFIT": "GROSS PROFIT",
+    "TOTAL HUMAN RESOURCES": "HUMAN RESOURCES",
+    "TOTAL OPERATING & GA EXPENSES": "OPERATIONAL EXPENSES",
+    "TOTAL DEPRECIATION & REPAIR MAINTENANCE": "DEPRECIATION & MAINTENANCE",
+    "GRAND TOTAL EXPENSES": "TOTAL EXPENSES",
+    "TOTAL OTHER INCOME / EXPENSES": "OTHER INCOME / EXPENSES",
+    "EARNINGS AFTER TAX (EAT)": "NET PROFIT",
+}
+
+
+def month_name(label):
+    words = str(label).split()
+    return words[0].capitalize()[:3] if words else None
+
+
+# Long format: one row per COA line, budget cell or JPCC/Others figure.
+# Budget summary rows and JPCC/Others figures have no COA; the latter have
+# no category either. Values are stored as read, without display scaling.
+def as_fact_table(df, categories):
+    return df.reindex(columns=COLUMNS).astype(
+        {
+            "company": "category",
+            "year": "int64",
+            "month": pd.CategoricalDtype(MONTHS, ordered=True),
+            "type": pd.CategoricalDtype(TYPES),
+            "COA": "Int64",
+            "category": pd.CategoricalDtype(categories, ordered=True),
+            "description": "object",
+            "value": "float64",
+        }
+    )
+
+
+def concat_fact_tables(tables, categories):
+    tables = [table for table in tables if not table.empty]
+
+    if not tables:
+        return as_fact_table(pd.DataFrame(columns=COLUMNS), categories)
+
+    return as_fact_table(pd.concat(tables, ignore_index=True), categories)
+
+
+def management_report_facts(file_name, df, category_codes):
+    month = next((month for month in MONTHS if month in file_name), None)
+    if month is None:
+        return None
+
+    lines = pd.DataFrame(
+        {
+            "COA": pd.to_numeric(df.iloc[:, 0], errors="coerce"),
+            "description": df.iloc[:, 1],
+            "value": pd.to_numeric(df.iloc[:, 2], errors="coerce"),
+        }
+    ).dropna(subset=["COA"])
+    lines = lines.astype({"COA": "int64"}).merge(category_codes, on="COA")
+
+    return lines.assign(month=month, type="Actual")
+
+
+def budget_facts(df, category_codes):
+    labels = df.iloc[BUDGET_HEADER_ROW]
+    duplicates = labels.duplicated(keep=False)
+    sheet = df.iloc[BUDGET_HEADER_ROW + 1 :].reset_index(drop=True)
+    sheet.columns = [
+        f"{label}_{i}" if duplicates.iloc[i] else label
+        for i, label in enumerate(labels)
+    ]
+    month_columns = [
+        column for column in sheet.columns.astype(str) if "nan" not in column.lower()
+    ]
+
+    lines = sheet[["nan_0"] + month_columns].rename(columns={"nan_0": "COA"})
+    lines["COA"] = pd.to_numeric(lines["COA"], errors="coerce")
+    lines = lines.dropna(subset=["COA"]).astype({"COA": "int64"})
+    lines = lines.merge(category_codes, on="COA")
+
+    summary = sheet[["nan_2", "nan_3"] + month_columns]
+    summary_labels = summary["nan_2"].fillna(summary["nan_3"])
+    summary = summary.assign(
+        category=summary_labels.map(lambda s: str(s).strip().upper()).map(
+            BUDGET_SUMMARY_ROWS
+        )
+    ).dropna(subset=["category"])
+
+    cells = pd.concat(
+        [
+            lines.melt(
+                id_vars=["COA", "category"], var_name="label", value_name="value"
+            ),
+            summary[["category"] + month_columns].melt(
+                id_vars="category", var_name="label", value_name="value"
+            ),
+        ],
+        ignore_index=True,
+    )
+    cells["month"] = cells["label"].map(month_name)
+    cells["value"] = pd.to_numeric(cells["value"], errors="coerce")
+
+    return cells.drop(columns="label").assign(type="Budget")
+
+
+# Maps one parsed company/year folder. category_codes holds the (COA,
+# category) pairs of the chart of accounts; lines outside it are dropped.
+def partition_facts(company, year, partition, category_codes, categories):
+    tables = []
+
+    for file_name, df in partition.items():
+        if df is None or df.empty:
+            st.warning(
+                f"File '{file_name}' for '{company}' in year '{year}' is empty or missing."
+            )
+            continue
+
+        if "Management Report" in file_name:
+            facts = management_report_facts(file_name, df, category_codes)
+        elif "Budget" in file_name:
+            facts = budget_facts(df, category_codes)
+        else:
+            facts = None
+
+        if facts is not None:
+            tables.append(facts.assign(company=company, year=year))
+
+    return concat_fact_tables(tables, categories).dropna(subset=["month"])
+
+
+def jpcc_facts(jpcc_vs_others, categories):
+    if jpcc_vs_others.empty:
+        return concat_fact_tables([], categories)
+
+    table = jpcc_vs_others.reset_index(drop=True)
+    table = table.assign(month=table["month"].map(month_name))
+
+    # JPCC and Others of a row stay next to each other
+    facts = pd.concat(
+        [
+            table.assign(type="JPCC", value=table["jpcc"]),
+            table.assign(type="Others", value=table["others"]),
+        ]
+    ).sort_index(kind="stable")
+
+    return concat_fact_tables([facts], categories).dropna(subset=["month"])
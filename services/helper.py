@@ -4,120 +4,655 @@ import calendar
 import dropbox
 from io import BytesIO
 from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import copy
+import datetime as dt
+import threading
+import time
+import os
+import hashlib
 import unicodedata
 import re
 
-import services.dropboxAuth as dropboxAuth
 from services.supabaseService import supabase_client
 
 from bs4 import BeautifulSoup
 from openpyxl import Workbook
 from openpyxl.styles import Border, Side, Font, PatternFill
 import services.supabaseService as supabaseService
+import services.cacheService as cacheService
+import services.factTable as factTable
+from services.diskCache import SheetCache, WorkbookCache
+from services.memoryCache import PartitionCache
+from services.sharedCache import SharedCache
+from services.storageBackend import create_storage_backend, dropbox_content_hash
+from services.workbookParser import parse_workbook, sheet_cache_key
 
-access_token = dropboxAuth.get_access_token()
-dbx = dropbox.Dropbox(access_token)
 
+storage = create_storage_backend()
+
+DROPBOX_SETTINGS = st.secrets.get("dropbox", {})
+DROPBOX_MAX_WORKERS = int(DROPBOX_SETTINGS.get("MAX_WORKERS", 8))
+DROPBOX_ZIP_MIN_FILES = int(DROPBOX_SETTINGS.get("ZIP_MIN_FILES", 4))
+DROPBOX_ZIP_MAX_MB = int(DROPBOX_SETTINGS.get("ZIP_MAX_MB", 200))
+PARSE_MAX_WORKERS = int(
+    st.secrets.get("parsing", {}).get("MAX_WORKERS", os.cpu_count() or 1)
+)
+
+CACHE_SETTINGS = st.secrets.get("cache", {})
+WORKBOOK_CACHE_DIR = CACHE_SETTINGS.get("WORKBOOK_DIR", ".cache/workbooks")
+WORKBOOK_CACHE_MAX_MB = int(CACHE_SETTINGS.get("WORKBOOK_MAX_MB", 1024))
+
+SHEET_CACHE_DIR = CACHE_SETTINGS.get("SHEET_DIR", ".cache/sheets")
+SHEET_CACHE_MAX_MB = int(CACHE_SETTINGS.get("SHEET_MAX_MB", 512))
+
+workbook_cache = WorkbookCache(WORKBOOK_CACHE_DIR, WORKBOOK_CACHE_MAX_MB * 1024 * 1024)
+sheet_cache = SheetCache(SHEET_CACHE_DIR, SHEET_CACHE_MAX_MB * 1024 * 1024)
+
+PREPARE_CACHE_MAX_ENTRIES = int(CACHE_SETTINGS.get("PREPARE_MAX_ENTRIES", 256))
+DATA_STORE_TTL_MINUTES = int(CACHE_SETTINGS.get("DATA_STORE_TTL_MINUTES", 60))
+COA_TTL_MINUTES = int(CACHE_SETTINGS.get("COA_TTL_MINUTES", 10))
+
+PARTITION_CACHE_MAX_MB = int(CACHE_SETTINGS.get("PARTITION_MAX_MB", 1024))
+PARTITION_CACHE_HOT_ENTRIES = int(CACHE_SETTINGS.get("PARTITION_HOT_ENTRIES", 16))
+PARTITION_CACHE_COMPRESS = bool(CACHE_SETTINGS.get("PARTITION_COMPRESS", True))
+
+partition_cache = PartitionCache(
+    PARTITION_CACHE_MAX_MB * 1024 * 1024,
+    PARTITION_CACHE_HOT_ENTRIES,
+    PARTITION_CACHE_COMPRESS,
+)
+
+# Optional SQLite file shared by all Streamlit processes on the host
+SHARED_CACHE_PATH = CACHE_SETTINGS.get("SHARED_PATH", "")
+# Bump when the format of shared prepared results changes
+SHARED_CACHE_SCHEMA = 2
+
+shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+
+WARMUP_SETTINGS = st.secrets.get("warmup", {})
+WARMUP_ON_START = bool(WARMUP_SETTINGS.get("ON_START", True))
+WARMUP_INTERVAL_MINUTES = int(WARMUP_SETTINGS.get("INTERVAL_MINUTES", 0))
+WARMUP_YEARS = int(WARMUP_SETTINGS.get("YEARS", 2))
+
+# Parsed partitions are shared by every session, so each data store gets
+# shallow copies and any write from a page copies the data instead of
+# changing the shared frames.
+pd.set_option("mode.copy_on_write", True)
+
+
+def download_workbook(company, file_path, file_name, content_hash, valid_codes):
+    sheet_name = sheet_cache_key(company, file_name, valid_codes)
+    if sheet_name is None:
+        return None
+
+    df = sheet_cache.get(content_hash, sheet_name)
+    if df is not None:
+        return df
+
+    content = workbook_cache.get(file_path, content_hash)
+
+    if content is None:
+        content = storage.read_bytes(file_path)
+        workbook_cache.put(file_path, content_hash, content)
+
+    df = parse_workbook(company, file_name, content, valid_codes, PARSE_MAX_WORKERS)
+    if df is not None:
+        sheet_cache.put(content_hash, sheet_name, df)
+
+    return df
+
+
+def needs_download(company, year, file_name, content_hash, valid_codes):
+    sheet_name = sheet_cache_key(company, file_name, valid_codes)
+
+    return (
+        sheet_name is not None
+        and not sheet_cache.contains(content_hash, sheet_name)
+        and not workbook_cache.contains(f"/{company}/{year}/{file_name}", content_hash)
+    )
+
+
+def download_folder_zip(company, year, files):
+    expected = {file_name.lower(): content_hash for file_name, content_hash in files}
+
+    for file_name, content in storage.download_folder(company, year).items():
+        content_hash = expected.get(file_name.lower())
+        # skip files that changed after the listing was taken
+        if content_hash is not None and dropbox_content_hash(content) == content_hash:
+            file_path = f"/{company}/{year}/{file_name}"
+            workbook_cache.put(file_path, content_hash, content)
+
+
+# A cold company/year folder is fetched with one files_download_zip call
+# instead of one request per workbook. Small or mostly cached folders, and
+# backends without folder downloads, keep using per-file reads.
+def prefetch_partition(company, year, files, valid_codes):
+    if not storage.supports_folder_download:
+        return
+
+    missing = [
+        (file_name, content_hash, size)
+        for file_name, (content_hash, size) in files
+        if needs_download(company, year, file_name, content_hash, valid_codes)
+    ]
+    missing_size = sum(size for _, _, size in missing)
+    folder_size = sum(size for _, (_, size) in files)
+
+    if (
+        len(missing) < DROPBOX_ZIP_MIN_FILES
+        or folder_size > DROPBOX_ZIP_MAX_MB * 1024 * 1024
+        or missing_size * 2 < folder_size
+    ):
+        return
 
-@st.cache_data
-def fetch_dropbox_data():
-    data_store = {}
     try:
-        for entry in dbx.files_list_folder("").entries:
-            if isinstance(entry, dropbox.files.FolderMetadata):
-                company = entry.name
-                data_store[company] = {}
-
-                try:
-                    year_entries = dbx.files_list_folder(f"/{company}").entries
-                except dropbox.exceptions.ApiError as e:
-                    st.warning(f"Skipping {company} due to API error: {e}")
-                    continue
-
-                for year_entry in year_entries:
-                    if (
-                        isinstance(year_entry, dropbox.files.FolderMetadata)
-                        and year_entry.name.isdigit()
-                    ):
-                        year = int(year_entry.name)
-                        data_store[company][year] = {}
+        download_folder_zip(
+            company,
+            year,
+            [(file_name, content_hash) for file_name, content_hash, _ in missing],
+        )
+    except Exception as e:
+        # only an optimisation: API, network or archive errors fall back to
+        # the per-file reads in read_partition
+        print(f"Zip download failed for {company}/{year}, using single files: {e}")
+
+
+# Parsed partitions are held once per process in partition_cache; a
+# partition it evicted is read back from the sheet and workbook caches.
+# Returns the partition and {file_name: error} for the workbooks that could
+# not be read. Such a partition is incomplete and never cached.
+def load_partition(
+    company, year, files, valid_codes, max_workers=DROPBOX_MAX_WORKERS, generation=None
+):
+    key = (company, year, files, valid_codes, generation)
+    partition = partition_cache.get(key)
+
+    if partition is not None:
+        return partition, {}
+
+    return cacheService.single_flight.run(
+        ("partition", key),
+        lambda: cache_partition(key, company, year, files, valid_codes, max_workers),
+    )
+
+
+def cache_partition(key, company, year, files, valid_codes, max_workers):
+    partition, failures = read_partition(
+        company, year, files, valid_codes, max_workers
+    )
+    if not failures:
+        partition_cache.put(key, partition)
+    return partition, failures
+
+
+def read_partition(company, year, files, valid_codes, max_workers):
+    partition = {}
+    failures = {}
+    prefetch_partition(company, year, files, valid_codes)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        downloads = {
+            file_name: executor.submit(
+                download_workbook,
+                company,
+                f"/{company}/{year}/{file_name}",
+                file_name,
+                content_hash,
+                valid_codes,
+            )
+            for file_name, (content_hash, _) in files
+        }
+
+        for file_name, future in downloads.items():
+            try:
+                df = future.result()
+            except Exception as e:
+                failures[file_name] = e
+                continue
+
+            if df is not None:
+                partition[file_name] = df
+
+    return partition, failures
+
+
+def listing_version(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# complete, if given, is checked after compute; a result it rejects is
+# returned but not shared
+def shared_result(namespace, key, version, compute, max_age=None, complete=None):
+    if shared_cache is None:
+        return compute()
+
+    version = (SHARED_CACHE_SCHEMA, version)
+    result = shared_cache.get(namespace, key, version, max_age)
+
+    if result is None:
+        result = compute()
+        if complete is None or complete():
+            shared_cache.put(namespace, key, version, result)
+
+    return result
+
+
+# Results computed from one company/year folder, shared under its content
+# version unless a workbook of it failed to load
+def shared_partition_result(namespace, data_store, company, year, compute):
+    return shared_result(
+        namespace,
+        (company, year),
+        data_store.content_version(company, year),
+        compute,
+        complete=lambda: data_store.is_complete(company, year),
+    )
+
+
+# Mapping over the storage listing that only downloads and parses a
+# company/year folder the first time it is indexed. Membership tests and
+# iteration never trigger a load.
+#
+# version and partition_version() are computed from the file hashes and
+# the COA, so cached functions can take the store as an unhashed _data_store
+# argument and key on the token instead. partition_version() also folds in
+# the in-process invalidation counters; version and content_version() leave
+# them out and are stable across processes.
+class LazyDataStore(Mapping):
+
+    def __init__(
+        self,
+        tree,
+        valid_codes,
+        max_workers=DROPBOX_MAX_WORKERS,
+        version=None,
+        built_at=None,
+        coa_registry=None,
+    ):
+        self.tree = tree
+        self.valid_codes = valid_codes
+        self.max_workers = max_workers
+        self.built_at = built_at or dt.datetime.now()
+        self.partitions = {}
+        self.partition_versions = {}
+        self.incomplete = set()
+        # The COA the listing was filtered with; facts are mapped with it too,
+        # so they always match the versions they are cached under
+        self.coa_registry = coa_registry
+        self.codes_version = listing_version(
+            valid_codes, coa_registry.version if coa_registry else None
+        )
+        self.version = version or listing_version(
+            self.codes_version,
+            sorted(
+                (company, year, self.content_version(company, year))
+                for company, years in tree.items()
+                for year in years
+            ),
+        )
+
+    def __reduce__(self):
+        return LazyDataStore, (
+            self.tree,
+            self.valid_codes,
+            self.max_workers,
+            self.version,
+            self.built_at,
+            self.coa_registry,
+        )
+
+    def partition_version(self, company, year):
+        if (company, year) not in self.partition_versions:
+            self.partition_versions[(company, year)] = listing_version(
+                self.content_version(company, year),
+                cacheService.partition_token(company, year),
+            )
+
+        return self.partition_versions[(company, year)]
+
+    def content_version(self, company, year):
+        return listing_version(
+            self.codes_version, sorted(self.tree[company][year].items())
+        )
+
+    def is_complete(self, company, year):
+        return (company, year) not in self.incomplete
+
+    def __getitem__(self, company):
+        if company not in self.tree:
+            raise KeyError(company)
+        return CompanyPartitions(self, company)
+
+    def __contains__(self, company):
+        return company in self.tree
+
+    def __iter__(self):
+        return iter(self.tree)
+
+    def __len__(self):
+        return len(self.tree)
+
+    def load(self, company, year):
+        if (company, year) not in self.partitions:
+            files = tuple(self.tree[company][year].items())
+            partition, failures = load_partition(
+                company,
+                year,
+                files,
+                self.valid_codes,
+                self.max_workers,
+                cacheService.partition_token(company, year),
+            )
+
+            for file_name, e in failures.items():
+                st.error(f"Error reading {file_name}: {e}")
+
+            # Results built from this view stay keyed on the old token; the
+            # next view gets a new partition_version and reads the files again
+            if failures:
+                self.incomplete.add((company, year))
+                cacheService.invalidate_partition(company, year)
+
+            self.partitions[(company, year)] = {
+                file_name: df.copy(deep=False) for file_name, df in partition.items()
+            }
+
+        return self.partitions[(company, year)]
+
+
+class CompanyPartitions(Mapping):
+
+    def __init__(self, data_store, company):
+        self.data_store = data_store
+        self.company = company
+        self.years = data_store.tree[company]
+
+    def __getitem__(self, year):
+        if year not in self.years:
+            raise KeyError(year)
+        return self.data_store.load(self.company, year)
+
+    def __contains__(self, year):
+        return year in self.years
+
+    def __iter__(self):
+        return iter(self.years)
+
+    def __len__(self):
+        return len(self.years)
+
+
+# A cold start may reuse a listing another process published within the
+# TTL; rebuilds always list storage again and publish the result.
+def build_data_store(max_workers=DROPBOX_MAX_WORKERS, reuse_listing=False):
+    tree = None
+    if reuse_listing and shared_cache is not None:
+        tree = shared_cache.get(
+            "listing",
+            storage.name,
+            SHARED_CACHE_SCHEMA,
+            max_age=DATA_STORE_TTL_MINUTES * 60,
+        )
+
+    if tree is None:
+        tree = storage.list_tree(max_workers)
+        if shared_cache is not None:
+            shared_cache.put("listing", storage.name, SHARED_CACHE_SCHEMA, tree)
+
+    coa_registry = get_coa_registry()
+    valid_codes = tuple(sorted(set(coa_registry.codes)))
+    return LazyDataStore(tree, valid_codes, max_workers, coa_registry=coa_registry)
+
+
+# Serves the last complete data store while a newer one is built on a
+# background thread. Only the very first build blocks a page; after that a
+# Refresh or an expired snapshot never waits on storage.
+class DataStoreSnapshots:
+
+    def __init__(self, max_workers=DROPBOX_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.generation = None
+        self.data_store = None
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def get(self):
+        generation = data_store_generation()
+
+        with self.lock:
+            if self.data_store is not None:
+                if self.is_stale(generation) and not self.rebuilding:
+                    self.rebuilding = True
+                    threading.Thread(
+                        target=self.rebuild,
+                        args=(generation, self.data_store),
+                        daemon=True,
+                    ).start()
+
+                return self.data_store
+
+        data_store = self.build(reuse_listing=True)
+
+        with self.lock:
+            if self.data_store is None:
+                self.generation, self.data_store = generation, data_store
+
+            return self.data_store
+
+    # Builds and swaps in a new snapshot right away, for scheduled refreshes
+    def refresh(self):
+        generation = data_store_generation()
+        data_store = self.build()
+
+        with self.lock:
+            self.generation, self.data_store = generation, data_store
+
+        return data_store
+
+    def build(self, reuse_listing=False):
+        return cacheService.single_flight.run(
+            ("data_store", self.max_workers),
+            lambda: build_data_store(self.max_workers, reuse_listing),
+        )
+
+    def is_stale(self, generation):
+        age = dt.datetime.now() - self.data_store.built_at
+        return (
+            generation != self.generation
+            or age > dt.timedelta(minutes=DATA_STORE_TTL_MINUTES)
+        )
+
+    def rebuild(self, generation, previous):
+        try:
+            data_store = self.build()
+            preload_changed_partitions(data_store, previous)
+
+            with self.lock:
+                self.generation, self.data_store = generation, data_store
+        except Exception as e:
+            print(f"Background data refresh failed: {e}")
+        finally:
+            with self.lock:
+                self.rebuilding = False
+
+
+def data_store_generation():
+    return cacheService.listing_token(), cacheService.table_token("COA")
+
+
+def latest_years(data_store, count=WARMUP_YEARS):
+    years = sorted({year for company in data_store for year in data_store[company]})
+    return years[-count:] if count > 0 else []
+
+
+# Loads the partitions of the latest years whose files changed, so the
+# swapped-in snapshot is as warm as the one it replaces. Loading goes through
+# a throwaway view: the shared snapshot must not hold partitions itself, or
+# partition_cache could never free them.
+def preload_changed_partitions(data_store, previous):
+    data_store = copy.copy(data_store)
+
+    for company in data_store:
+        for year in latest_years(data_store):
+            if year in data_store[company] and (
+                company not in previous
+                or year not in previous[company]
+                or data_store.partition_version(company, year)
+                != previous.partition_version(company, year)
+            ):
+                data_store.load(company, year)
 
-                        try:
-                            file_entries = dbx.files_list_folder(
-                                f"/{company}/{year}"
-                            ).entries
-                        except dropbox.exceptions.ApiError as e:
-                            st.warning(
-                                f"Skipping {company}/{year} due to API error: {e}"
-                            )
-                            continue
-
-                        for file_entry in file_entries:
-
-                            if isinstance(
-                                file_entry, dropbox.files.FileMetadata
-                            ) and file_entry.name.endswith(".xlsx"):
-                                file_path = f"/{company}/{year}/{file_entry.name}"
-
-                                try:
-                                    _, res = dbx.files_download(file_path)
-                                    xls = pd.ExcelFile(BytesIO(res.content))
-
-                                    if "Management Report" in file_entry.name:
-                                        df = pd.read_excel(xls, engine="openpyxl")
-                                        data_store[company][year][file_entry.name] = df
-                                    elif "Budget" in file_entry.name:
-                                        df = pd.read_excel(
-                                            xls, sheet_name=company, engine="openpyxl"
-                                        )
-                                        data_store[company][year][file_entry.name] = df
-                                    elif "JPCC vs Others" in file_entry.name:
-                                        jpcc_sheet_name = next(
-                                            (
-                                                s
-                                                for s in xls.sheet_names
-                                                if "jpcc vs others" in s.lower()
-                                            ),
-                                            None,
-                                        )
-                                        if jpcc_sheet_name:
-                                            df = pd.read_excel(
-                                                xls,
-                                                sheet_name=jpcc_sheet_name,
-                                                engine="openpyxl",
-                                            )
-                                            data_store[company][year][
-                                                file_entry.name
-                                            ] = df
-
-                                except Exception as e:
-                                    st.error(f"Error reading {file_entry.name}: {e}")
-
-    except dropbox.exceptions.ApiError as e:
-        st.error(f"Dropbox Error: {e}")
+
+@st.cache_resource
+def get_data_store_snapshots(max_workers=DROPBOX_MAX_WORKERS):
+    return DataStoreSnapshots(max_workers)
+
+
+# Each caller gets its own view of the shared snapshot
+def fetch_dropbox_data(max_workers=DROPBOX_MAX_WORKERS):
+    return copy.copy(get_data_store_snapshots(max_workers).get())
+
+
+def show_data_as_of(data_store):
+    st.sidebar.caption(f"Data as of {data_store.built_at:%d %b %Y %H:%M}")
+
+
+def fetch_jpcc_vs_others():
+    return load_jpcc_vs_others(cacheService.table_token("JPCC vs Others"))
+
+
+@st.cache_data(max_entries=2)
+def load_jpcc_vs_others(generation):
+    return pd.DataFrame(supabaseService.fetch_data("JPCC vs Others"))
+
+
+# Every page reads the same long-format fact table. Each partition is mapped
+# to the chart of accounts once per file content and COA version, then only
+# concatenated for the companies and years asked for.
+def fetch_facts(data_store, companies, years):
+    coa_registry = data_store.coa_registry
+    tables = [
+        load_partition_facts(
+            data_store, company, year, data_store.partition_version(company, year)
+        )
+        for company in companies
+        if company in data_store
+        for year in years
+        if year in data_store[company]
+    ]
+
+    jpcc = load_jpcc_facts(cacheService.table_token("JPCC vs Others"))
+    tables.append(jpcc[jpcc["company"].isin(companies) & jpcc["year"].isin(years)])
+
+    return factTable.concat_fact_tables(tables, list(coa_registry.account_categories))
+
+
+@st.cache_data(max_entries=PREPARE_CACHE_MAX_ENTRIES)
+def load_partition_facts(_data_store, company, year, version):
+    return shared_partition_result(
+        "facts",
+        _data_store,
+        company,
+        year,
+        lambda: build_partition_facts(_data_store, company, year),
+    )
+
+
+def build_partition_facts(data_store, company, year):
+    coa_registry = data_store.coa_registry
+    return factTable.partition_facts(
+        company,
+        year,
+        data_store[company][year],
+        coa_registry.category_codes,
+        list(coa_registry.account_categories),
+    )
+
+
+@st.cache_data(max_entries=2)
+def load_jpcc_facts(generation):
+    return factTable.jpcc_facts(
+        fetch_jpcc_vs_others(), list(get_coa_registry().account_categories)
+    )
+
+
+# Loads the data store and the latest years' facts, JPCC table included, so
+# interactive sessions start from warm caches. Scheduled runs re-read the
+# sources first.
+def warm_up(years=WARMUP_YEARS, refresh=False, max_workers=DROPBOX_MAX_WORKERS):
+    snapshots = get_data_store_snapshots(max_workers)
+
+    if refresh:
+        cacheService.invalidate_sources()
+        data_store = snapshots.refresh()
+    else:
+        data_store = snapshots.get()
+
+    get_coa_registry()
+    fetch_facts(
+        copy.copy(data_store), list(data_store), latest_years(data_store, years)
+    )
 
     return data_store
 
 
-@st.cache_data
-def get_available_months(data, companies, selected_year):
-    months = set()
+def run_warmup_schedule(interval_minutes=WARMUP_INTERVAL_MINUTES):
+    refresh = False
 
-    for key, value in data.items():
-        parts = key.split("_")
-        if len(parts) == 3:
-            company, month, year = parts
-            if company in companies and year == str(selected_year):
-                months.add(month)
+    while True:
+        try:
+            warm_up(refresh=refresh)
+        except Exception as e:
+            print(f"Cache warm-up failed: {e}")
 
-    return (
-        sorted(months, key=lambda m: list(calendar.month_abbr).index(m))
-        if months
-        else []
+        if interval_minutes <= 0:
+            return
+
+        time.sleep(interval_minutes * 60)
+        refresh = True
+
+
+# Called from the entry script (Login.py), which Streamlit runs for the
+# first visitor of a fresh server, so the warm-up starts before anyone logs
+# in. Cached as a resource, so there is one scheduler per process.
+@st.cache_resource
+def start_warmup_scheduler(interval_minutes=WARMUP_INTERVAL_MINUTES):
+    thread = threading.Thread(
+        target=run_warmup_schedule, args=(interval_minutes,), daemon=True
     )
+    thread.start()
+    return thread
+
+
+# Company/year folder names only, for pages that never read the workbooks
+def fetch_company_directory(max_workers=DROPBOX_MAX_WORKERS):
+    return load_company_directory(max_workers, cacheService.listing_token())
+
+
+@st.cache_data(max_entries=2)
+def load_company_directory(max_workers, listing_generation):
+    return storage.list_directory(max_workers)
+
+
+# data is keyed by (company, year, month). Scanning the keys is cheaper than
+# hashing the whole mapping for st.cache_data, so this is left uncached.
+def get_available_months(data, companies, selected_year):
+    companies = set(companies)
+    months = {
+        month
+        for company, year, month in data
+        if company in companies and year == selected_year
+    }
+
+    return sorted(months, key=lambda m: list(calendar.month_abbr).index(m))
 
 
-@st.cache_data
 def get_available_companies_and_years(data_store):
     companies = sorted(data_store.keys())
     years = sorted({year for company in data_store for year in data_store[company]})
@@ -332,9 +867,13 @@ def export_all_tables_to_excel(company_html_dict):
     return output
 
 
-def get_pnl_account_categories_dict():
+def read_pnl_account_categories_dict():
 
-    df = pd.DataFrame(supabaseService.fetch_data("COA"))
+    df = pd.DataFrame(
+        cacheService.single_flight.run(
+            ("table", "COA"), lambda: supabaseService.fetch_data("COA")
+        )
+    )
 
     pnl_account_categories_dict = {}
     for _, row in df.iterrows():
@@ -352,7 +891,7 @@ def get_pnl_account_categories_dict():
     return pnl_account_categories_dict
 
 
-def get_all_coa():
+def get_all_coa(pnl_account_categories_dict=None):
     codes = []
 
     def recurse_dict(d):
@@ -362,11 +901,58 @@ def get_all_coa():
             else:
                 codes.append(key)
 
-    recurse_dict(get_pnl_account_categories_dict())
+    if pnl_account_categories_dict is None:
+        return list(get_coa_registry().codes)
+
+    recurse_dict(pnl_account_categories_dict)
 
     return codes
 
 
+# One COA fetch feeds the nested mapping, the flat code list and the report
+# category codes for every session in the process. Shared, so read-only.
+class CoaRegistry:
+
+    def __init__(self, pnl_account_categories_dict):
+        self.pnl_account_categories_dict = pnl_account_categories_dict
+        self.codes = get_all_coa(pnl_account_categories_dict)
+        self.account_categories = transform_to_category_codes(
+            pnl_account_categories_dict
+        )
+        # (COA, category) pairs for mapping report lines in bulk
+        self.category_codes = pd.DataFrame(
+            [
+                (code, category)
+                for category, codes in self.account_categories.items()
+                for code in dict.fromkeys(codes or [])
+            ],
+            columns=["COA", "category"],
+        )
+        self.version = listing_version(
+            sorted(
+                repr((main_category, subcategory, coa, description))
+                for main_category, subcategories in pnl_account_categories_dict.items()
+                for subcategory, codes in subcategories.items()
+                for coa, description in codes.items()
+            )
+        )
+
+
+# Reloaded after [cache] COA_TTL_MINUTES, or right away once save_coa_data
+# bumps the COA table generation
+def get_coa_registry():
+    return load_coa_registry(cacheService.table_token("COA"))
+
+
+@st.cache_resource(ttl=COA_TTL_MINUTES * 60, max_entries=2)
+def load_coa_registry(generation):
+    return CoaRegistry(read_pnl_account_categories_dict())
+
+
+def get_pnl_account_categories_dict():
+    return get_coa_registry().pnl_account_categories_dict
+
+
 def verify_user():
     if "access_token" in st.session_state and st.session_state["access_token"]:
         token = st.session_state["access_token"]
@@ -406,3 +992,17 @@ def verify_user():
             return False
 
     return False
+
+
+# python -m services.helper warmup, e.g. from cron after the nightly close
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m services.helper")
+    parser.add_argument("command", choices=["warmup"])
+    parser.add_argument("--years", type=int, default=WARMUP_YEARS)
+    args = parser.parse_args()
+
+    data_store = warm_up(args.years)
+    print(
+        f"Warmed {len(data_store)} companies, "
+        f"data as of {data_store.built_at:%d %b %Y %H:%M}"
+    )
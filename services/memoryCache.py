@@ -0,0 +1,76 @@
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+
+
+def partition_size(frames):
+    return int(
+        sum(df.memory_usage(index=True, deep=True).sum() for df in frames.values())
+    )
+
+
+# In-memory LRU of parsed partitions with a byte budget. The most recently
+# used partitions stay as DataFrames; older ones can be kept as compressed
+# pickles and are inflated again on their next use. Evicted partitions are
+# simply reloaded from the disk caches by the caller.
+class PartitionCache:
+
+    def __init__(self, max_bytes, hot_entries=16, compress=True, compress_level=1):
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+        self.compress = compress
+        self.compress_level = compress_level
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            self.entries.move_to_end(key)
+            frames, compressed, size = entry
+
+            if frames is not None:
+                return frames
+
+        frames = pickle.loads(zlib.decompress(compressed))
+
+        with self.lock:
+            if self.entries.get(key) is entry:
+                self.replace(key, (frames, None, partition_size(frames)))
+                self.shrink()
+
+        return frames
+
+    def put(self, key, frames):
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[2]
+
+            self.entries[key] = (frames, None, partition_size(frames))
+            self.total_bytes += self.entries[key][2]
+            self.shrink()
+
+    def replace(self, key, entry):
+        self.total_bytes += entry[2] - self.entries[key][2]
+        self.entries[key] = entry
+
+    def shrink(self):
+        if self.compress:
+            for key in list(self.entries)[: -self.hot_entries or None]:
+                frames, compressed, size = self.entries[key]
+                if frames is not None:
+                    compressed = zlib.compress(
+                        pickle.dumps(frames, protocol=pickle.HIGHEST_PROTOCOL),
+                        self.compress_level,
+                    )
+                    self.replace(key, (None, compressed, len(compressed)))
+
+        # the most recent partition is kept even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, _, size) = self.entries.popitem(last=False)
+            self.total_bytes -= size
@@ -0,0 +1,85 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+)
+"""
+
+
+# SQLite file shared by every Streamlit process on the host. Each key keeps
+# only its latest value together with the version it was computed for, so a
+# reader never gets a result built from other inputs.
+class SharedCache:
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+
+    def connect(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = sqlite3.connect(self.path, timeout=self.timeout)
+
+        return self.local.connection
+
+    def get(self, namespace, key, version, max_age=None):
+        try:
+            row = (
+                self.connect()
+                .execute(
+                    "SELECT version, value, updated_at FROM entries "
+                    "WHERE namespace = ? AND key = ?",
+                    (namespace, repr(key)),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            print(f"Shared cache read failed for {namespace} {key}: {e}")
+            return None
+
+        if row is None or row[0] != str(version):
+            return None
+        if max_age is not None and time.time() - row[2] > max_age:
+            return None
+
+        try:
+            return pickle.loads(row[1])
+        except Exception as e:
+            print(f"Shared cache entry {namespace} {key} is unreadable: {e}")
+            return None
+
+    def put(self, namespace, key, version, value):
+        try:
+            with self.connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(namespace, key, version, value, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        namespace,
+                        repr(key),
+                        str(version),
+                        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                        time.time(),
+                    ),
+                )
+        except sqlite3.Error as e:
+            print(f"Shared cache write failed for {namespace} {key}: {e}")
@@ -0,0 +1,355 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import dropbox
+import streamlit as st
+
+STORAGE_SETTINGS = st.secrets.get("storage", {})
+
+
+def dropbox_content_hash(content):
+    block_size = 4 * 1024 * 1024
+    block_hashes = b"".join(
+        hashlib.sha256(content[i : i + block_size]).digest()
+        for i in range(0, len(content), block_size)
+    )
+    return hashlib.sha256(block_hashes).hexdigest()
+
+
+def find_key(mapping, name):
+    return next((key for key in mapping if str(key).lower() == name.lower()), None)
+
+
+# Every backend exposes the same /{company}/{year}/*.xlsx layout. Listings
+# map file names to (content_hash, size), with content hashes computed the
+# Dropbox way so the disk caches are shared between backends.
+#
+# Backends that can fetch a whole year folder in one request set
+# supports_folder_download and implement download_folder(company, year),
+# returning {file_name: bytes}.
+class StorageBackend(ABC):
+    name = "Storage"
+    errors = (OSError,)
+    supports_folder_download = False
+
+    @abstractmethod
+    def list_companies(self):
+        pass
+
+    @abstractmethod
+    def list_years(self, company):
+        pass
+
+    @abstractmethod
+    def list_files(self, company, year):
+        pass
+
+    @abstractmethod
+    def read_bytes(self, path):
+        pass
+
+    def list_tree(self, max_workers):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return self.crawl_tree(executor, [])
+
+    def list_directory(self, max_workers):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return self.crawl_directory(executor, [])
+
+    # Company and year folders only, without listing any workbooks. Folders
+    # that could not be listed are reported as empty and added to failures.
+    def crawl_directory(self, executor, failures):
+        directory = {}
+
+        try:
+            companies = self.list_companies()
+        except self.errors as e:
+            st.error(f"{self.name} Error: {e}")
+            failures.append("/")
+            return directory
+
+        year_listings = {
+            company: executor.submit(self.list_years, company) for company in companies
+        }
+
+        for company, future in year_listings.items():
+            try:
+                directory[company] = future.result()
+            except self.errors as e:
+                st.warning(f"Skipping {company} due to API error: {e}")
+                failures.append(f"/{company}")
+                directory[company] = []
+
+        return directory
+
+    def crawl_tree(self, executor, failures):
+        directory = self.crawl_directory(executor, failures)
+        tree = {company: {} for company in directory}
+
+        file_listings = {}
+        for company, years in directory.items():
+            for year in years:
+                tree[company][year] = {}
+                file_listings[(company, year)] = executor.submit(
+                    self.list_files, company, year
+                )
+
+        for (company, year), future in file_listings.items():
+            try:
+                tree[company][year] = future.result()
+            except self.errors as e:
+                st.warning(f"Skipping {company}/{year} due to API error: {e}")
+                failures.append(f"/{company}/{year}")
+
+        return tree
+
+
+class DropboxBackend(StorageBackend):
+    name = "Dropbox"
+    errors = (dropbox.exceptions.ApiError,)
+    supports_folder_download = True
+
+    def __init__(self):
+        self.client = None
+        self.client_lock = threading.Lock()
+        self.cursor = None
+        self.tree = {}
+        self.lock = threading.Lock()
+
+    # Created on first use, so importing the helpers (for example in parse
+    # workers) does not request an access token
+    @property
+    def dbx(self):
+        with self.client_lock:
+            if self.client is None:
+                import services.dropboxAuth as dropboxAuth
+
+                self.client = dropbox.Dropbox(dropboxAuth.get_access_token())
+
+            return self.client
+
+    def list_folder_entries(self, path):
+        result = self.dbx.files_list_folder(path)
+        entries = list(result.entries)
+
+        while result.has_more:
+            result = self.dbx.files_list_folder_continue(result.cursor)
+            entries.extend(result.entries)
+
+        return entries
+
+    def is_workbook_entry(self, entry):
+        return isinstance(entry, dropbox.files.FileMetadata) and entry.name.endswith(
+            ".xlsx"
+        )
+
+    def list_companies(self):
+        return [
+            entry.name
+            for entry in self.list_folder_entries("")
+            if isinstance(entry, dropbox.files.FolderMetadata)
+        ]
+
+    def list_years(self, company):
+        return [
+            int(entry.name)
+            for entry in self.list_folder_entries(f"/{company}")
+            if isinstance(entry, dropbox.files.FolderMetadata)
+            and entry.name.isdigit()
+        ]
+
+    def list_files(self, company, year):
+        return {
+            entry.name: (entry.content_hash, entry.size)
+            for entry in self.list_folder_entries(f"/{company}/{year}")
+            if self.is_workbook_entry(entry)
+        }
+
+    def read_bytes(self, path):
+        _, res = self.dbx.files_download(path)
+        return res.content
+
+    def download_folder(self, company, year):
+        _, res = self.dbx.files_download_zip(f"/{company}/{year}")
+        contents = {}
+
+        with zipfile.ZipFile(BytesIO(res.content)) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    contents[info.filename.rsplit("/", 1)[-1]] = archive.read(info)
+
+        return contents
+
+    # The first listing crawls every folder; later ones only fetch the
+    # entries changed since the stored cursor. The change feed never reports
+    # unchanged folders, so a crawl that failed to list any folder, or whose
+    # cursor could not be fetched, does not keep a cursor and the next
+    # listing crawls again.
+    def list_tree(self, max_workers):
+        with self.lock:
+            if not self.list_changes():
+                failures = []
+
+                try:
+                    cursor = self.dbx.files_list_folder_get_latest_cursor(
+                        "", recursive=True
+                    ).cursor
+                except self.errors as e:
+                    st.error(f"{self.name} Error: {e}")
+                    failures.append("/")
+                    cursor = None
+
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    self.tree = self.crawl_tree(executor, failures)
+
+                self.cursor = None if failures else cursor
+
+            return {
+                company: {year: dict(files) for year, files in years.items()}
+                for company, years in self.tree.items()
+            }
+
+    # Applies the change feed to the stored tree. False when there is no
+    # cursor or the feed could not be read, and the tree has to be crawled.
+    def list_changes(self):
+        if self.cursor is None:
+            return False
+
+        try:
+            return self.apply_changes()
+        except self.errors as e:
+            st.error(f"{self.name} Error: {e}")
+            self.cursor = None
+            return False
+
+    def apply_changes(self):
+        try:
+            result = self.dbx.files_list_folder_continue(self.cursor)
+            changes = list(result.entries)
+
+            while result.has_more:
+                result = self.dbx.files_list_folder_continue(result.cursor)
+                changes.extend(result.entries)
+        except dropbox.exceptions.ApiError as e:
+            if isinstance(e.error, dropbox.files.ListFolderContinueError) and (
+                e.error.is_reset()
+            ):
+                return False
+            raise
+
+        self.cursor = result.cursor
+
+        for entry in changes:
+            parts = (entry.path_display or entry.path_lower).strip("/").split("/")
+
+            if isinstance(entry, dropbox.files.DeletedMetadata):
+                self.remove_path(parts)
+            elif isinstance(entry, dropbox.files.FolderMetadata):
+                if len(parts) == 1:
+                    self.tree.setdefault(entry.name, {})
+                elif len(parts) == 2 and parts[1].isdigit():
+                    company = find_key(self.tree, parts[0]) or parts[0]
+                    self.tree.setdefault(company, {}).setdefault(int(parts[1]), {})
+            elif (
+                self.is_workbook_entry(entry)
+                and len(parts) == 3
+                and parts[1].isdigit()
+            ):
+                company = find_key(self.tree, parts[0]) or parts[0]
+                year_files = self.tree.setdefault(company, {}).setdefault(
+                    int(parts[1]), {}
+                )
+                existing = find_key(year_files, entry.name)
+                if existing not in (None, entry.name):
+                    del year_files[existing]
+                year_files[entry.name] = (entry.content_hash, entry.size)
+
+        return True
+
+    def remove_path(self, parts):
+        company = find_key(self.tree, parts[0])
+        if company is None:
+            return
+
+        if len(parts) == 1:
+            del self.tree[company]
+            return
+
+        if not parts[1].isdigit() or int(parts[1]) not in self.tree[company]:
+            return
+
+        year = int(parts[1])
+        if len(parts) == 2:
+            del self.tree[company][year]
+        elif len(parts) == 3:
+            year_files = self.tree[company][year]
+            year_files.pop(find_key(year_files, parts[2]), None)
+
+
+class LocalBackend(StorageBackend):
+    name = "Local storage"
+
+    def __init__(self, root):
+        self.root = root
+        self.hashes = {}
+        self.lock = threading.Lock()
+
+    def full_path(self, path):
+        return os.path.join(self.root, path.strip("/"))
+
+    def list_companies(self):
+        return sorted(
+            entry.name for entry in os.scandir(self.root) if entry.is_dir()
+        )
+
+    def list_years(self, company):
+        return sorted(
+            int(entry.name)
+            for entry in os.scandir(self.full_path(company))
+            if entry.is_dir() and entry.name.isdigit()
+        )
+
+    def list_files(self, company, year):
+        files = {}
+
+        for entry in sorted(
+            os.scandir(self.full_path(f"{company}/{year}")), key=lambda e: e.name
+        ):
+            if entry.is_file() and entry.name.endswith(".xlsx"):
+                path = f"/{company}/{year}/{entry.name}"
+                files[entry.name] = (self.content_hash(path), entry.stat().st_size)
+
+        return files
+
+    def read_bytes(self, path):
+        with open(self.full_path(path), "rb") as f:
+            return f.read()
+
+    # Hashes are remembered per (size, mtime) so re-listing only reads files
+    # that actually changed.
+    def content_hash(self, path):
+        stat = os.stat(self.full_path(path))
+        key = (path, stat.st_size, stat.st_mtime_ns)
+
+        with self.lock:
+            if key in self.hashes:
+                return self.hashes[key]
+
+        content_hash = dropbox_content_hash(self.read_bytes(path))
+
+        with self.lock:
+            self.hashes[key] = content_hash
+
+        return content_hash
+
+
+def create_storage_backend():
+    if STORAGE_SETTINGS.get("BACKEND", "dropbox").lower() == "local":
+        return LocalBackend(STORAGE_SETTINGS.get("LOCAL_ROOT", "data"))
+
+    return DropboxBackend()
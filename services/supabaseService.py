@@ -2,6 +2,8 @@ import supabase
 import streamlit as st
 import pandas as pd
 
+import services.cacheService as cacheService
+
 SUPABASE_URL = st.secrets["supabase"]["SUPABASE_URL"]
 SUPABASE_KEY = st.secrets["supabase"]["SUPABASE_KEY"]
 
@@ -64,6 +66,8 @@ def save_jpcc_data(updated_data, original_data):
         except Exception as e:
             print(f"Error deleting row for {row['company']} {row['month']} {row['year']}: {e}")
 
+    cacheService.invalidate_table("JPCC vs Others")
+
 
 def save_coa_data(updated_data, original_data):
     for _, row in updated_data.iterrows():
@@ -99,6 +103,8 @@ def save_coa_data(updated_data, original_data):
                 .execute()
         except Exception as e:
             print(f"Error deleting COA {row['coa']}: {e}")
+
+    cacheService.invalidate_table("COA")
             
 
 
@@ -144,4 +150,4 @@ def save_user_data(updated_data, original_data):
             supabase_client.table("Users") \
                 .delete() \
                 .eq("id", delete_id) \
-                .execute()
\ No newline at end of file
+                .execute()
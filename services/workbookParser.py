@@ -0,0 +1,175 @@
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+MANAGEMENT_REPORT_CHUNK_ROWS = 1024
+
+parse_pool = None
+parse_pool_lock = threading.Lock()
+
+
+def workbook_sheet_name(company, file_name):
+    if "Management Report" in file_name:
+        return 0
+    elif "Budget" in file_name:
+        return company
+    elif "JPCC vs Others" in file_name:
+        return "jpcc vs others"
+
+    return None
+
+
+def sheet_cache_key(company, file_name, valid_codes):
+    sheet_name = workbook_sheet_name(company, file_name)
+
+    # Management Reports are filtered by the chart of accounts while parsing
+    if "Management Report" in file_name:
+        codes = ",".join(str(code) for code in sorted(valid_codes))
+        return f"{sheet_name}:{hashlib.sha1(codes.encode('utf-8')).hexdigest()}"
+
+    return sheet_name
+
+
+def parse_coa(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+
+    return None
+
+
+def parse_amount(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            return np.nan
+
+    return np.nan
+
+
+def iter_management_report(
+    content, valid_codes, chunk_rows=MANAGEMENT_REPORT_CHUNK_ROWS
+):
+    workbook = load_workbook(BytesIO(content), read_only=True, data_only=True)
+
+    try:
+        worksheet = workbook.worksheets[0]
+        codes, descriptions, values = [], [], []
+
+        # the first row is the header, as with pd.read_excel
+        for row in worksheet.iter_rows(min_row=2, max_col=3, values_only=True):
+            row = tuple(row) + (None,) * (3 - len(row))
+            code = parse_coa(row[0])
+
+            if code is None or code not in valid_codes:
+                continue
+
+            codes.append(code)
+            descriptions.append(row[1])
+            values.append(parse_amount(row[2]))
+
+            if len(codes) >= chunk_rows:
+                yield management_report_chunk(codes, descriptions, values)
+                codes, descriptions, values = [], [], []
+
+        if codes:
+            yield management_report_chunk(codes, descriptions, values)
+    finally:
+        workbook.close()
+
+
+def management_report_chunk(codes, descriptions, values):
+    description_array = np.empty(len(descriptions), dtype=object)
+    description_array[:] = descriptions
+
+    return (
+        np.array(codes, dtype=np.int64),
+        description_array,
+        np.array(values, dtype=np.float64),
+    )
+
+
+def read_management_report(content, valid_codes):
+    chunks = list(iter_management_report(content, frozenset(valid_codes)))
+
+    if not chunks:
+        chunks = [management_report_chunk([], [], [])]
+
+    codes, descriptions, values = zip(*chunks)
+    return pd.DataFrame(
+        {
+            "COA": np.concatenate(codes),
+            "Description": np.concatenate(descriptions),
+            "Value": np.concatenate(values),
+        }
+    )
+
+
+def read_workbook(company, file_name, content, valid_codes):
+    if "Management Report" in file_name:
+        return read_management_report(content, valid_codes)
+
+    xls = pd.ExcelFile(BytesIO(content))
+
+    if "Budget" in file_name:
+        return pd.read_excel(xls, sheet_name=company, engine="openpyxl")
+    elif "JPCC vs Others" in file_name:
+        jpcc_sheet_name = next(
+            (s for s in xls.sheet_names if "jpcc vs others" in s.lower()),
+            None,
+        )
+        if jpcc_sheet_name:
+            return pd.read_excel(xls, sheet_name=jpcc_sheet_name, engine="openpyxl")
+
+    return None
+
+
+def get_parse_pool(max_workers):
+    global parse_pool
+
+    with parse_pool_lock:
+        if parse_pool is None:
+            # spawn keeps the workers free of the Streamlit server's threads
+            parse_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        return parse_pool
+
+
+def reset_parse_pool(pool):
+    global parse_pool
+
+    with parse_pool_lock:
+        if parse_pool is pool:
+            parse_pool = None
+
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_workbook(company, file_name, content, valid_codes, max_workers):
+    pool = get_parse_pool(max_workers)
+
+    try:
+        return pool.submit(
+            read_workbook, company, file_name, content, valid_codes
+        ).result()
+    except BrokenProcessPool:
+        reset_parse_pool(pool)
+        return read_workbook(company, file_name, content, valid_codes)